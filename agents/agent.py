@@ -9,11 +9,16 @@ This system uses a team of specialized agents to:
 5. Write and iteratively refine a research proposal
 """
 
+import difflib
+import json
 import logging
+import logging.handlers
 import os
+from typing import Final
 from google.adk.agents import Agent, SequentialAgent, ParallelAgent, LoopAgent
-from google.adk.tools import FunctionTool, google_search
+from google.adk.tools import FunctionTool, ToolContext, google_search
 from google.genai import types
+from pydantic import BaseModel, Field
 
 # ============================================================================
 # Logging Configuration
@@ -23,34 +28,119 @@ from google.genai import types
 _CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_FILE = os.path.join(_CURRENT_DIR, "agent.log")
 
-# Configure logging with DEBUG log level for comprehensive observability
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    force=True,  # Force reconfiguration in case logging was already configured
-)
-
-# Configure ADK loggers to capture framework-level logs
-adk_logger = logging.getLogger("google.adk")
-adk_logger.setLevel(logging.DEBUG)
+# Log level defaults to INFO; set AGENT_LOG_LEVEL=DEBUG for comprehensive
+# observability. At DEBUG, ADK formats and writes every internal event
+# (including full prompt/response bodies) on the hot path, so it is opt-in
+# rather than the default.
+LOG_LEVEL = getattr(logging, os.getenv("AGENT_LOG_LEVEL", "INFO").upper(), logging.INFO)
 
-# Get a logger for this module
+# Get a logger for this module (cheap; no handlers are set up at import time)
 module_logger = logging.getLogger(__name__)
-module_logger.info("Research Proposal Agentic System - Logging initialized")
-module_logger.debug(f"Log file: {LOG_FILE}")
 
-print(f"✅ Logging configured - log file: {LOG_FILE}")
+
+def configure_logging(level=None):
+    """
+    Configure file logging for the agent system.
+
+    Called explicitly by entry points (e.g. run_programmatically.py) rather
+    than at import time, so that merely importing this module stays cheap for
+    tests, tooling, and cold starts. Also emits the startup diagnostics here,
+    since records logged at import time are dropped before handlers exist.
+    """
+    if level is None:
+        level = LOG_LEVEL
+
+    logging.basicConfig(
+        level=level,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        force=True,  # Force reconfiguration in case logging was already configured
+        # Rotate the log file so long-running sessions can't fill the disk
+        handlers=[
+            logging.handlers.RotatingFileHandler(LOG_FILE, maxBytes=10_000_000, backupCount=3)
+        ],
+    )
+
+    # Configure ADK loggers to capture framework-level logs
+    adk_logger = logging.getLogger("google.adk")
+    adk_logger.setLevel(level)
+
+    module_logger.info("Research Proposal Agentic System - Logging initialized")
+    module_logger.debug(f"Log file: {LOG_FILE}")
+
+    if _PARALLEL_TOOLS_KWARGS:
+        module_logger.info("Parallel tool execution enabled for search agents")
+    else:
+        module_logger.info(
+            "Installed ADK version has no enable_parallel_tool_execution flag; "
+            "tool calls will run sequentially"
+        )
+    module_logger.info("All agents and workflow orchestration complete")
+    module_logger.info(
+        f"Root agent '{root_agent.name}' created with {len(root_agent.sub_agents)} phases"
+    )
+
+    print(f"✅ Logging configured - log file: {LOG_FILE}")
+
+# ============================================================================
+# Session State Keys
+# ============================================================================
+
+# Shared session-state keys wiring producers (output_key) to their consumers
+# (callbacks and prompt templates). Defined once so the pairs stay in sync.
+WINNING_PROJECTS_KEY: Final[str] = "winning_projects"
+EVALUATION_CRITERIA_KEY: Final[str] = "evaluation_criteria"
+ANALYSIS_AND_INTERSECTION_KEY: Final[str] = "analysis_and_intersection"
+PRACTICAL_CRITERIA_KEY: Final[str] = "practical_criteria"
+INTERSECTED_TOPICS_KEY: Final[str] = "intersected_topics"
+TOPIC_PROPOSAL_KEY: Final[str] = "topic_proposal"
+RESEARCH_PROPOSAL_KEY: Final[str] = "research_proposal"
+PREV_RESEARCH_PROPOSAL_KEY: Final[str] = "prev_research_proposal"
+EVALUATION_FEEDBACK_KEY: Final[str] = "evaluation_feedback"
+
+# ============================================================================
+# Model Selection
+# ============================================================================
+
+# Search-backed and long-form writing agents use the standard fast tier.
+# Agents that only reorganize text already in their context (topic selection,
+# evaluation) get the smallest available tier: lower time-to-first-token and
+# faster decode with no quality-sensitive output.
+FAST_MODEL = "gemini-2.5-flash-lite"
+NANO_MODEL = "gemini-flash-lite-latest"
+
+# ============================================================================
+# Parallel Tool Execution
+# ============================================================================
+
+# ADK runs the tool calls emitted in a single model response sequentially by
+# default, so k independent searches in one turn cost the sum of their
+# latencies instead of roughly the slowest one. Newer ADK versions expose an
+# opt-in flag on Agent; pass it only when the installed version supports it so
+# older installs keep working unchanged.
+# The detection result is logged from configure_logging(); at import time no
+# handlers exist yet and the record would be dropped.
+_PARALLEL_TOOLS_KWARGS = {}
+if "enable_parallel_tool_execution" in getattr(Agent, "model_fields", {}):
+    _PARALLEL_TOOLS_KWARGS["enable_parallel_tool_execution"] = True
+
+# Shared instruction hint so the model actually emits independent searches as
+# parallel tool calls in one response rather than one query per turn.
+PARALLEL_SEARCH_HINT = """
+When multiple independent searches are needed, emit them as parallel tool calls
+in a single response instead of one search per turn."""
 
 # ============================================================================
 # Custom Tools
 # ============================================================================
 
-def exit_proposal_loop():
+def exit_proposal_loop(tool_context: ToolContext):
     """
     Call this function when the proposal evaluation indicates approval.
     This exits the iterative refinement loop.
     """
+    # Escalating breaks out of the enclosing LoopAgent immediately (ADK's
+    # loop-exit mechanism), so no further loop iterations run.
+    tool_context.actions.escalate = True
     return {"status": "approved", "message": "Proposal approved. Exiting refinement loop."}
 
 
@@ -58,10 +148,7 @@ def exit_proposal_loop():
 # Agent 1: WinningProjectsResearcher
 # ============================================================================
 
-winning_projects_researcher = Agent(
-    name="WinningProjectsResearcher",
-    model="gemini-2.5-flash-lite",
-    instruction="""You are a research specialist focused on finding winning high school science competition projects.
+WINNING_RESEARCHER_INSTRUCTION: Final[str] = """You are a research specialist focused on finding winning high school science competition projects.
 
 Your task is to search for and compile information about projects that have won major high school science competitions 
 (such as Synopsis, Regeneron Science Talent Search, Intel ISEF, Google Science Fair, etc.) in recent years (2020-2024).
@@ -78,19 +165,24 @@ Focus on projects that demonstrate:
 - Scientific rigor appropriate for high school students
 - Innovation and creativity
 
-Use the google_search tool to find this information.""",
+Use the google_search tool to find this information.""" + PARALLEL_SEARCH_HINT
+
+
+winning_projects_researcher = Agent(
+    name="WinningProjectsResearcher",
+    model=FAST_MODEL,
+    instruction=WINNING_RESEARCHER_INSTRUCTION,
     tools=[google_search],
-    output_key="winning_projects",
+    output_key=WINNING_PROJECTS_KEY,
+    generate_content_config=types.GenerateContentConfig(max_output_tokens=1200, temperature=0.3),
+    **_PARALLEL_TOOLS_KWARGS,
 )
 
 # ============================================================================
 # Agent 2: CriteriaResearcher
 # ============================================================================
 
-criteria_researcher = Agent(
-    name="CriteriaResearcher",
-    model="gemini-2.5-flash-lite",
-    instruction="""You are a specialist in understanding evaluation criteria for high school science competitions.
+CRITERIA_RESEARCHER_INSTRUCTION: Final[str] = """You are a specialist in understanding evaluation criteria for high school science competitions.
 
 Your task is to search for and compile the official criteria and rubrics used to evaluate projects in major 
 high school science competitions (Synopsis, Regeneron STS, Intel ISEF, Google Science Fair, etc.).
@@ -106,26 +198,63 @@ Present your findings in a structured format that clearly shows:
 - How projects are scored
 - What distinguishes winning projects
 
-Use the google_search tool to find this information.""",
+Use the google_search tool to find this information.""" + PARALLEL_SEARCH_HINT
+
+
+criteria_researcher = Agent(
+    name="CriteriaResearcher",
+    model=FAST_MODEL,
+    instruction=CRITERIA_RESEARCHER_INSTRUCTION,
     tools=[google_search],
-    output_key="evaluation_criteria",
+    output_key=EVALUATION_CRITERIA_KEY,
+    generate_content_config=types.GenerateContentConfig(max_output_tokens=1200, temperature=0.3),
+    **_PARALLEL_TOOLS_KWARGS,
 )
 
 # ============================================================================
-# Agent 3: CriteriaAnalyzer
+# Agents 3+4: AnalysisAndIntersection (fused CriteriaAnalyzer + TopicIntersector)
 # ============================================================================
 
-criteria_analyzer = Agent(
-    name="CriteriaAnalyzer",
-    model="gemini-2.5-flash-lite",
-    instruction="""You are an expert analyst who correlates winning projects with evaluation criteria.
+# Both analysis steps consume the research-phase outputs and were previously
+# run as two separate sequential model turns. Fusing them into one agent saves
+# a full LLM round-trip; the two sections are split back out into the state
+# keys the downstream topic_proposer expects by the callback below.
 
-Your task is to analyze the winning projects and evaluation criteria provided, and create a practical, 
-actionable set of criteria and rubrics that can guide the generation of a winning topic and project proposal.
+def _delimited_section(combined, marker, other_marker):
+    """Return the text between `marker` and `other_marker` (or end of output)."""
+    _, found, rest = combined.partition(marker)
+    if not found:
+        return ""
+    section, _, _ = rest.partition(other_marker)
+    return section.strip()
 
-Inputs:
-- Winning Projects: {winning_projects}
-- Evaluation Criteria: {evaluation_criteria}
+
+def split_analysis_and_intersection(callback_context):
+    """
+    Split the fused agent's delimited output into the two state keys
+    (`practical_criteria` and `intersected_topics`) consumed downstream.
+    Section order does not matter.
+    """
+    combined = callback_context.state.get(ANALYSIS_AND_INTERSECTION_KEY, "")
+    criteria = _delimited_section(
+        combined, "### PRACTICAL_CRITERIA ###", "### INTERSECTED_TOPICS ###"
+    )
+    topics = _delimited_section(
+        combined, "### INTERSECTED_TOPICS ###", "### PRACTICAL_CRITERIA ###"
+    )
+    # Fall back to the full output if the model omitted the delimiters, so the
+    # downstream prompts never see an empty input.
+    callback_context.state[PRACTICAL_CRITERIA_KEY] = criteria or combined
+    callback_context.state[INTERSECTED_TOPICS_KEY] = topics or combined
+
+
+ANALYSIS_AND_INTERSECTION_INSTRUCTION: Final[str] = """You are an expert analyst and research strategist for high school science competitions.
+
+You have TWO tasks to complete in a single response.
+
+TASK 1 - PRACTICAL CRITERIA:
+Analyze the winning projects and evaluation criteria provided, and create a practical,
+actionable set of criteria and rubrics that can guide the generation of a winning topic and project proposal.
 
 Analyze:
 1. What common characteristics do winning projects share?
@@ -140,23 +269,8 @@ Output a comprehensive, practical guide that includes:
 - Actionable guidelines for topic selection
 - Actionable guidelines for proposal writing
 
-Format your output clearly with sections and bullet points.""",
-    output_key="practical_criteria",
-)
-
-# ============================================================================
-# Agent 4: TopicIntersector
-# ============================================================================
-
-topic_intersector = Agent(
-    name="TopicIntersector",
-    model="gemini-2.5-flash-lite",
-    instruction="""You are a research strategist who identifies topics that are both:
-1. Proven winners in high school competitions
-2. Currently of active interest to the research community
-
-Your task is to:
-1. Extract the main topic areas from the winning projects: {winning_projects}
+TASK 2 - INTERSECTED TOPICS:
+1. Extract the main topic areas from the winning projects
 2. For each topic area, search for current active research using google_search
 3. Identify 3-5 topics that meet BOTH criteria:
    - Have won competitions (proven track record)
@@ -167,25 +281,87 @@ For each selected topic, provide:
 - Evidence it has won competitions (cite specific projects)
 - Evidence of current research activity
 - Why it's suitable for high school students (accessibility)
-- Why it matters to society/humanity
+- Why it matters to society/humanity""" + PARALLEL_SEARCH_HINT + """
+
+Format your output EXACTLY as two delimited sections. Emit the intersected
+topics FIRST: they are the primary input of the next stage, so putting them
+first makes them available earliest while the response streams.
+
+### INTERSECTED_TOPICS ###
+[Task 2 output here]
 
-Use google_search to verify current research activity for each topic.""",
+### PRACTICAL_CRITERIA ###
+[Task 1 output here]
+
+INPUTS:
+- Winning Projects: {winning_projects}
+- Evaluation Criteria: {evaluation_criteria}"""
+
+
+analysis_and_intersection = Agent(
+    name="AnalysisAndIntersection",
+    model=FAST_MODEL,
+    instruction=ANALYSIS_AND_INTERSECTION_INSTRUCTION,
     tools=[google_search],
-    output_key="intersected_topics",
+    output_key=ANALYSIS_AND_INTERSECTION_KEY,
+    generate_content_config=types.GenerateContentConfig(max_output_tokens=1700, temperature=0.3),
+    after_agent_callback=split_analysis_and_intersection,
+    **_PARALLEL_TOOLS_KWARGS,
 )
 
 # ============================================================================
 # Agent 5: TopicProposer
 # ============================================================================
 
-topic_proposer = Agent(
-    name="TopicProposer",
-    model="gemini-2.5-flash-lite",
-    instruction="""You are a topic selection expert who proposes the best research topic for a high school science competition.
-
-Based on the following inputs:
-- Practical Criteria: {practical_criteria}
-- Intersected Topics: {intersected_topics}
+# Constrained JSON output instead of freeform Markdown: the model skips the
+# formatting scaffolding (shorter decode) and the result is deterministically
+# parseable. The callback below re-renders it as compact text so the
+# downstream writer/evaluator prompts stay readable.
+# Field order matters: selected_topic is generated first so the earliest bytes
+# of the response carry the one field everything downstream depends on.
+class TopicProposal(BaseModel):
+    """Structured output of TopicProposer (set via LlmAgent.output_schema)."""
+
+    selected_topic: str = Field(
+        description="Name and 2-3 sentence description of the selected topic"
+    )
+    why_this_topic: str = Field(
+        description="Alignment with winning criteria, accessibility for high "
+        "school students, current research interest, and societal impact"
+    )
+    evaluation_criteria_and_rubric: str = Field(
+        description="Detailed criteria and scoring rubric specific to this topic"
+    )
+    key_success_factors: list[str] = Field(
+        description="Critical factors that will determine success"
+    )
+
+
+def render_topic_proposal(callback_context):
+    """
+    Re-render the topic proposer's structured output as compact text under the
+    same `topic_proposal` state key, so the writer and evaluator prompts read
+    it naturally. ADK stores output_schema results as a dict; a JSON string is
+    handled too, and anything else is left in place untouched.
+    """
+    raw = callback_context.state.get(TOPIC_PROPOSAL_KEY, "")
+    if isinstance(raw, dict):
+        data = raw
+    else:
+        try:
+            data = json.loads(raw)
+        except (TypeError, ValueError):
+            return
+    factors = "\n".join(f"- {factor}" for factor in data.get("key_success_factors", []))
+    callback_context.state[TOPIC_PROPOSAL_KEY] = (
+        f"**SELECTED TOPIC:**\n{data.get('selected_topic', '')}\n\n"
+        f"**WHY THIS TOPIC:**\n{data.get('why_this_topic', '')}\n\n"
+        f"**EVALUATION CRITERIA AND RUBRIC:**\n{data.get('evaluation_criteria_and_rubric', '')}\n\n"
+        f"**KEY SUCCESS FACTORS:**\n{factors}"
+    )
+
+
+TOPIC_PROPOSER_INSTRUCTION: Final[str] = """You are a topic selection expert who proposes the best research topic for a high school science competition.
 
 Your task is to:
 1. Select the BEST single topic from the intersected topics that:
@@ -199,36 +375,40 @@ Your task is to:
    - Create a detailed rubric with scoring guidelines
    - Identify key success factors for this topic
 
-Output your proposal in this format:
-
-**SELECTED TOPIC:**
-[Topic name and description]
+Respond with a JSON object containing:
+- selected_topic: topic name and description
+- why_this_topic: alignment with winning criteria, accessibility for high school students, current research interest, and societal impact
+- evaluation_criteria_and_rubric: detailed criteria and scoring rubric specific to this topic
+- key_success_factors: list of critical factors that will determine success
 
-**WHY THIS TOPIC:**
-- Alignment with winning criteria: [explanation]
-- Accessibility for high school students: [explanation]
-- Current research interest: [explanation]
-- Societal impact: [explanation]
+INPUTS:
+- Practical Criteria: {practical_criteria}
+- Intersected Topics: {intersected_topics}"""
 
-**EVALUATION CRITERIA AND RUBRIC:**
-[Detailed criteria and scoring rubric specific to this topic]
 
-**KEY SUCCESS FACTORS:**
-[List of critical factors that will determine success]""",
-    output_key="topic_proposal",
+topic_proposer = Agent(
+    name="TopicProposer",
+    model=NANO_MODEL,
+    instruction=TOPIC_PROPOSER_INSTRUCTION,
+    output_key=TOPIC_PROPOSAL_KEY,
+    # output_schema (not generate_content_config.response_schema, which ADK
+    # rejects on LlmAgent) drives the constrained JSON generation; permitted
+    # here because this agent has no tools.
+    output_schema=TopicProposal,
+    generate_content_config=types.GenerateContentConfig(
+        max_output_tokens=700,
+        temperature=0.3,
+    ),
+    after_agent_callback=render_topic_proposal,
 )
 
 # ============================================================================
 # Agent 6: Initial ProposalWriter (for first iteration)
 # ============================================================================
 
-initial_proposal_writer = Agent(
-    name="InitialProposalWriter",
-    model="gemini-2.5-flash-lite",
-    instruction="""You are an expert proposal writer for high school science competitions.
+INITIAL_WRITER_INSTRUCTION: Final[str] = """You are an expert proposal writer for high school science competitions.
 
-Your task is to write a comprehensive research proposal based on:
-- Selected Topic: {topic_proposal}
+Your task is to write a comprehensive research proposal for the selected topic given in INPUTS below.
 
 Write a complete research proposal that includes:
 
@@ -257,59 +437,28 @@ The proposal should be:
 - Well-structured and professional
 - Aligned with the evaluation criteria and rubric specified in the topic proposal
 - Appropriate for high school level
-- Compelling and likely to win""",
-    output_key="research_proposal",
-)
-
-# ============================================================================
-# Agent 7: ProposalEvaluator (for initial evaluation)
-# ============================================================================
+- Compelling and likely to win
 
-initial_proposal_evaluator = Agent(
-    name="InitialProposalEvaluator",
-    model="gemini-2.5-flash-lite",
-    instruction="""You are a strict but fair evaluator of high school science research proposals.
+INPUTS:
+- Selected Topic: {topic_proposal}"""
 
-Your task is to evaluate the research proposal against the criteria and rubric specified in the topic proposal.
-
-Inputs:
-- Research Proposal: {research_proposal}
-- Topic Proposal (contains criteria): {topic_proposal}
-
-Evaluate the proposal on:
-1. Alignment with evaluation criteria
-2. Scientific rigor and methodology
-3. Feasibility for high school students
-4. Potential impact and significance
-5. Clarity and presentation quality
-6. Likelihood of winning
 
-Provide:
-- Overall assessment (score/rating)
-- Strengths of the proposal
-- Specific weaknesses or gaps
-- Actionable suggestions for improvement
-
-If the proposal meets all criteria and has a high likelihood of winning, respond with EXACTLY: "APPROVED"
-Otherwise, provide detailed, specific feedback for improvement.""",
-    output_key="evaluation_feedback",
+initial_proposal_writer = Agent(
+    name="InitialProposalWriter",
+    model=FAST_MODEL,
+    instruction=INITIAL_WRITER_INSTRUCTION,
+    output_key=RESEARCH_PROPOSAL_KEY,
+    generate_content_config=types.GenerateContentConfig(max_output_tokens=2000, temperature=0.3),
 )
 
 # ============================================================================
-# Agent 8: ProposalEvaluator (for refinement loop)
+# Agent 7: ProposalEvaluator
 # ============================================================================
 
-refinement_proposal_evaluator = Agent(
-    name="RefinementProposalEvaluator",
-    model="gemini-2.5-flash-lite",
-    instruction="""You are a strict but fair evaluator of high school science research proposals.
+EVAL_INSTRUCTION: Final[str] = """You are a strict but fair evaluator of high school science research proposals.
 
 Your task is to evaluate the research proposal against the criteria and rubric specified in the topic proposal.
 
-Inputs:
-- Research Proposal: {research_proposal}
-- Topic Proposal (contains criteria): {topic_proposal}
-
 Evaluate the proposal on:
 1. Alignment with evaluation criteria
 2. Scientific rigor and methodology
@@ -318,16 +467,41 @@ Evaluate the proposal on:
 5. Clarity and presentation quality
 6. Likelihood of winning
 
-Provide:
-- Overall assessment (score/rating)
-- Strengths of the proposal
-- Specific weaknesses or gaps
-- Actionable suggestions for improvement
+VERDICT PROTOCOL - your FIRST line must be the verdict:
+- If the proposal meets all criteria and has a high likelihood of winning, emit the single token APPROVED on its own line and nothing else.
+- Otherwise emit NEEDS_WORK on the first line, then provide:
+  - Overall assessment (score/rating)
+  - Strengths of the proposal
+  - Specific weaknesses or gaps
+  - Actionable, specific suggestions for improvement
 
-If the proposal meets all criteria and has a high likelihood of winning, respond with EXACTLY: "APPROVED"
-Otherwise, provide detailed, specific feedback for improvement.""",
-    output_key="evaluation_feedback",
-)
+INPUTS:
+- Research Proposal: {research_proposal}
+- Topic Proposal (contains criteria): {topic_proposal}"""
+
+
+def make_evaluator(name):
+    """
+    Build a proposal evaluator. Every evaluator shares the single
+    EVAL_INSTRUCTION string, so their prompt prefixes are byte-identical and
+    the model-side prompt cache can hit across instances and loop iterations.
+    """
+    return Agent(
+        name=name,
+        model=NANO_MODEL,
+        instruction=EVAL_INSTRUCTION,
+        output_key=EVALUATION_FEEDBACK_KEY,
+        generate_content_config=types.GenerateContentConfig(
+            max_output_tokens=600,
+            temperature=0.3,
+            # Ends decoding immediately if the model tries to append a critique
+            # after an APPROVED verdict, so approvals cost only a handful of tokens.
+            stop_sequences=["\nNEEDS_WORK"],
+        ),
+    )
+
+
+initial_proposal_evaluator = make_evaluator("InitialProposalEvaluator")
 
 # ============================================================================
 # Workflow Orchestration
@@ -339,40 +513,53 @@ parallel_research_phase = ParallelAgent(
     sub_agents=[winning_projects_researcher, criteria_researcher],
 )
 
-# Step 2: Analysis phase - analyze criteria after research is complete
-analysis_phase = SequentialAgent(
-    name="AnalysisPhase",
-    sub_agents=[criteria_analyzer],
-)
-
-# Step 3: Topic intersection phase - find topics that meet both criteria
-topic_intersection_phase = SequentialAgent(
-    name="TopicIntersectionPhase",
-    sub_agents=[topic_intersector],
+# Step 2: Fused analysis phase - analyze criteria and intersect topics in one turn
+analysis_and_intersection_phase = SequentialAgent(
+    name="AnalysisAndIntersectionPhase",
+    sub_agents=[analysis_and_intersection],
 )
 
-# Step 4: Topic proposal phase - select best topic with criteria
+# Step 3: Topic proposal phase - select best topic with criteria
 topic_proposal_phase = SequentialAgent(
     name="TopicProposalPhase",
     sub_agents=[topic_proposer],
 )
 
-# Step 5: Proposal refinement loop - iterative improvement
+# Step 4: Proposal refinement loop - iterative improvement
 # Create a refined proposal writer that can exit the loop
 # This writer is used for revisions after the initial proposal
-# Note: evaluation_feedback will be available after the evaluator runs (which runs first in the loop)
-refined_proposal_writer = Agent(
-    name="RefinedProposalWriter",
-    model="gemini-2.5-flash-lite",
-    instruction="""You are an expert proposal writer for high school science competitions.
+# Note: evaluation_feedback is created by the initial evaluation phase below
+# Similarity threshold above which a revision is considered converged: further
+# iterations would spend a full LLM turn for a near-identical proposal.
+CONVERGENCE_RATIO = 0.95
 
-Your task is to revise the research proposal based on:
-- Selected Topic: {topic_proposal}
-- Current Proposal: {research_proposal}
-- Evaluation Feedback (from the evaluator): {evaluation_feedback}
+
+def stop_refinement_when_converged(callback_context):
+    """
+    End the refinement loop early once a revision barely differs from the
+    previous one, instead of spending the remaining iterations polishing.
+    Always records the current proposal for the next iteration's comparison.
+    """
+    current = callback_context.state.get(RESEARCH_PROPOSAL_KEY, "")
+    previous = callback_context.state.get(PREV_RESEARCH_PROPOSAL_KEY, "")
+    if previous and current:
+        ratio = difflib.SequenceMatcher(None, previous, current).quick_ratio()
+        if ratio >= CONVERGENCE_RATIO:
+            module_logger.info(
+                "Refinement converged (similarity %.2f >= %.2f); exiting loop",
+                ratio,
+                CONVERGENCE_RATIO,
+            )
+            callback_context.actions.escalate = True
+    callback_context.state[PREV_RESEARCH_PROPOSAL_KEY] = current
+
+
+REFINED_WRITER_INSTRUCTION: Final[str] = """You are an expert proposal writer for high school science competitions.
+
+Your task is to revise the research proposal given in INPUTS below.
 
 IMPORTANT: 
-- Check the evaluation feedback. If it is EXACTLY "APPROVED", you MUST call the `exit_proposal_loop` function.
+- Check the evaluation feedback. If its FIRST line is "APPROVED", you MUST call the `exit_proposal_loop` function.
 - Otherwise, revise the proposal to address all feedback points while maintaining all required sections:
   1. Title
   2. Abstract/Summary (150-200 words)
@@ -382,9 +569,22 @@ IMPORTANT:
   6. Expected Outcomes & Impact
   7. Feasibility
 
-The revised proposal should be well-structured, aligned with criteria, and compelling.""",
-    output_key="research_proposal",
+The revised proposal should be well-structured, aligned with criteria, and compelling.
+
+INPUTS:
+- Selected Topic: {topic_proposal}
+- Current Proposal: {research_proposal}
+- Evaluation Feedback (from the evaluator): {evaluation_feedback}"""
+
+
+refined_proposal_writer = Agent(
+    name="RefinedProposalWriter",
+    model=FAST_MODEL,
+    instruction=REFINED_WRITER_INSTRUCTION,
+    output_key=RESEARCH_PROPOSAL_KEY,
+    generate_content_config=types.GenerateContentConfig(max_output_tokens=2000, temperature=0.3),
     tools=[FunctionTool(exit_proposal_loop)],
+    after_agent_callback=stop_refinement_when_converged,
 )
 
 # Create the refinement workflow
@@ -401,11 +601,13 @@ initial_evaluation_phase = SequentialAgent(
 )
 
 # Step 3: Refinement loop for iterative improvement
-# Order: Writer (revises based on feedback), then Evaluator (evaluates revised proposal)
-# Note: evaluation_feedback exists from initial evaluation, so writer can reference it
+# The writer revises against the initial evaluation feedback; when that
+# feedback is APPROVED it calls exit_proposal_loop, whose escalate action
+# deterministically breaks the loop without spending another LLM turn on
+# re-evaluation.
 proposal_refinement_loop = LoopAgent(
     name="ProposalRefinementLoop",
-    sub_agents=[refined_proposal_writer, refinement_proposal_evaluator],
+    sub_agents=[refined_proposal_writer],
     max_iterations=3,  # Limit iterations to prevent infinite loops
 )
 
@@ -423,14 +625,13 @@ proposal_development_phase = SequentialAgent(
 root_agent = SequentialAgent(
     name="ResearchProposalSystem",
     sub_agents=[
-        parallel_research_phase,       # Step 1: Parallel research
-        analysis_phase,                # Step 2: Analyze criteria
-        topic_intersection_phase,      # Step 3: Intersect topics
-        topic_proposal_phase,          # Step 4: Propose topic
-        proposal_development_phase,    # Step 5: Write initial proposal and refine
+        parallel_research_phase,          # Step 1: Parallel research
+        analysis_and_intersection_phase,  # Step 2: Analyze criteria + intersect topics
+        topic_proposal_phase,             # Step 3: Propose topic
+        proposal_development_phase,       # Step 4: Write initial proposal and refine
     ],
 )
 
-module_logger.info("All agents and workflow orchestration complete")
-module_logger.info(f"Root agent '{root_agent.name}' created with {len(root_agent.sub_agents)} phases")
+# Orchestration-complete diagnostics are emitted from configure_logging(),
+# once handlers exist to receive them.
 
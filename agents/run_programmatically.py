@@ -6,6 +6,7 @@ for a high school science competition.
 """
 
 import asyncio
+import functools
 import os
 from dotenv import load_dotenv
 from google.adk.runners import Runner
@@ -13,41 +14,51 @@ from google.adk.sessions import InMemorySessionService
 from google.genai import types
 
 # Import the agent you defined in agent.py
-from agent import root_agent
+from agent import configure_logging, root_agent
 
 
-# Load environment variables from .env file
-load_dotenv()
+APP_NAME = "ResearchProposalSystem"
+
+
+# The session service and runner are process-wide singletons: drivers that
+# invoke the system more than once reuse them instead of rebuilding the agent
+# tree and session bookkeeping per call.
+@functools.lru_cache(maxsize=1)
+def get_session_service():
+    """Return the process-wide session service."""
+    return InMemorySessionService()
+
+
+@functools.lru_cache(maxsize=1)
+def get_runner():
+    """Return the process-wide runner for the research proposal system."""
+    return Runner(
+        agent=root_agent,
+        app_name=APP_NAME,
+        session_service=get_session_service(),
+    )
+
+
+def head(s, n=500):
+    """Return s truncated to n characters with an ellipsis marker."""
+    return s if len(s) <= n else s[:n] + "..."
 
-# # Load environment variables from parent directory (where .env file is located)
-# # The .env file is in the parent directory, not in the agents directory
-# current_dir = Path(__file__).parent
-# parent_dir = current_dir.parent
-# env_path = parent_dir / ".env"
-# load_dotenv(dotenv_path=env_path)
 
 async def run_research_proposal_system():
     """
     Run the complete research proposal generation system.
     """
-    # Initialize session service
-    session_service = InMemorySessionService()
-    app_name = "ResearchProposalSystem"
+    session_service = get_session_service()
     user_id = "student_researcher"
-    session_id = "research_session"
-    
-    # Create runner with session service
-    runner = Runner(
-        agent=root_agent,
-        app_name=app_name,
-        session_service=session_service,
-    )
-    
-    # Create a session
+
+    runner = get_runner()
+
+    # Create a session. No session_id is passed so the service generates a
+    # unique one per call: the service is a process-wide singleton, and a
+    # fixed id would collide on the second invocation.
     session = await session_service.create_session(
-        app_name=app_name,
+        app_name=APP_NAME,
         user_id=user_id,
-        session_id=session_id,
     )
     
     print("=" * 80)
@@ -79,20 +90,22 @@ async def run_research_proposal_system():
         parts=[types.Part(text=user_query)]
     )
     
-    # Run the agent
-    async for event in runner.run_async(
+    # Run the agent. The stream must be drained to completion: every sub-agent
+    # in the pipeline emits its own final response, so breaking out of this
+    # loop on the first one would cancel the remaining phases mid-run. The
+    # generator itself ends as soon as the root agent finishes.
+    async for _event in runner.run_async(
         user_id=user_id,
         session_id=session.id,
         new_message=user_content,
     ):
-        # Process events if needed
         pass
     
     # Get the final session to access state
     final_session = await session_service.get_session(
-        app_name=app_name,
+        app_name=APP_NAME,
         user_id=user_id,
-        session_id=session_id,
+        session_id=session.id,
     )
     
     # Display results
@@ -108,25 +121,25 @@ async def run_research_proposal_system():
     if "winning_projects" in state:
         print("1️⃣  WINNING PROJECTS RESEARCH:")
         print("-" * 80)
-        print(state["winning_projects"][:500] + "..." if len(state.get("winning_projects", "")) > 500 else state.get("winning_projects", ""))
+        print(head(state.get("winning_projects", "")))
         print()
     
     if "evaluation_criteria" in state:
         print("2️⃣  EVALUATION CRITERIA RESEARCH:")
         print("-" * 80)
-        print(state["evaluation_criteria"][:500] + "..." if len(state.get("evaluation_criteria", "")) > 500 else state.get("evaluation_criteria", ""))
+        print(head(state.get("evaluation_criteria", "")))
         print()
     
     if "practical_criteria" in state:
         print("3️⃣  PRACTICAL CRITERIA ANALYSIS:")
         print("-" * 80)
-        print(state["practical_criteria"][:500] + "..." if len(state.get("practical_criteria", "")) > 500 else state.get("practical_criteria", ""))
+        print(head(state.get("practical_criteria", "")))
         print()
     
     if "intersected_topics" in state:
         print("4️⃣  INTERSECTED TOPICS:")
         print("-" * 80)
-        print(state["intersected_topics"][:500] + "..." if len(state.get("intersected_topics", "")) > 500 else state.get("intersected_topics", ""))
+        print(head(state.get("intersected_topics", "")))
         print()
     
     if "topic_proposal" in state:
@@ -155,6 +168,14 @@ async def run_research_proposal_system():
 
 
 if __name__ == "__main__":
+    # Load environment variables from .env file. Done here rather than at
+    # import time so importing this module doesn't touch the filesystem or
+    # mutate the caller's environment.
+    load_dotenv()
+
+    # Set up file logging for this entry point (deferred out of import time)
+    configure_logging()
+
     # Check for API key
     if not os.getenv("GOOGLE_API_KEY"):
         print("⚠️  Warning: GOOGLE_API_KEY not found in environment variables.")